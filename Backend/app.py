@@ -1,10 +1,18 @@
 from flask import Flask, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 import os
+import queue
 import sys
 
+try:
+    import orjson
+except ImportError:  # Optional: fall back to Flask's stdlib JSON encoder
+    orjson = None
+
 # Add backend directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
@@ -13,10 +21,98 @@ from routes.predict import predict_bp
 from routes.charts import charts_bp
 from routes.dataset import dataset_bp
 from routes.dashboard import dashboard_bp
+from utils.load_model import model_loader
+from utils.preprocessing import load_dataset
+
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider that encodes with orjson, including numpy values"""
+    
+    def _encode(self, obj, sort_keys, indent, option=0):
+        option |= orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        # Dates and other non-native types go through Flask's default handler
+        return orjson.dumps(obj, default=self.default, option=option)
+    
+    def dumps(self, obj, **kwargs):
+        return self._encode(obj, kwargs.get('sort_keys', self.sort_keys), kwargs.get('indent')).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        """Build a jsonify() response from orjson's bytes, without a str round trip"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = self._encode(obj, self.sort_keys, indent, orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+# Handler feeding logs/flask_app.log through a background listener thread,
+# set up once per process and shared by every app created here
+_log_queue_handler = None
+_log_listener = None
+
+def _get_log_handler():
+    """
+    Return the QueueHandler for the app log, setting it up on first use
+    
+    Records are handed to a listener thread so requests don't block on file
+    I/O. The queue, listener and fork hook are only created once, however
+    many times create_app() runs.
+    """
+    global _log_queue_handler
+    if _log_queue_handler is not None:
+        return _log_queue_handler
+    
+    logs_dir = os.path.join(os.path.dirname(__file__), 'logs')
+    if not os.path.exists(logs_dir):
+        os.mkdir(logs_dir)
+    
+    file_handler = RotatingFileHandler(
+        os.path.join(logs_dir, 'flask_app.log'), 
+        maxBytes=5 * 1024 * 1024,  # 5MB per file before rotating
+        backupCount=10,
+        delay=True
+    )
+    file_handler.setFormatter(logging.Formatter(
+        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
+    ))
+    file_handler.setLevel(logging.INFO)
+    
+    queue_handler = QueueHandler(queue.Queue(-1))
+    
+    def start_log_listener():
+        global _log_listener
+        _log_listener = QueueListener(queue_handler.queue, file_handler, respect_handler_level=True)
+        _log_listener.start()
+    
+    def restart_log_listener():
+        # The listener thread does not survive a fork; give the child its own
+        queue_handler.queue = queue.Queue(-1)
+        start_log_listener()
+    
+    start_log_listener()
+    atexit.register(_stop_log_listener)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=restart_log_listener)
+    
+    _log_queue_handler = queue_handler
+    return queue_handler
+
+def _stop_log_listener():
+    """Flush queued records and stop this process's log listener"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
 
 def create_app():
     """Application factory pattern"""
     app = Flask(__name__)
+    if orjson is not None:
+        app.json = ORJSONProvider(app)
     
     # Configuration
     app.config['JSON_SORT_KEYS'] = False
@@ -31,24 +127,24 @@ def create_app():
         }
     })
     
-    # Setup logging
-    logs_dir = os.path.join(os.path.dirname(__file__), 'logs')
-    if not os.path.exists(logs_dir):
-        os.mkdir(logs_dir)
-    
-    file_handler = RotatingFileHandler(
-        os.path.join(logs_dir, 'flask_app.log'), 
-        maxBytes=10240, 
-        backupCount=10
-    )
-    file_handler.setFormatter(logging.Formatter(
-        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-    ))
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
+    # Setup logging (the handler is shared; adding it again is a no-op)
+    app.logger.addHandler(_get_log_handler())
     app.logger.setLevel(logging.INFO)
     app.logger.info('Stock Prediction API startup')
     
+    # Load model and encoder once at startup so requests hit the cache
+    try:
+        model_loader.load_model()
+        model_loader.load_label_encoder()
+    except Exception as e:
+        app.logger.warning(f'Model preload failed, will retry on first request: {str(e)}')
+    
+    # Same for the dataset, so preforked workers share the parsed frame
+    try:
+        load_dataset()
+    except Exception as e:
+        app.logger.warning(f'Dataset preload failed, will retry on first request: {str(e)}')
+    
     # Register blueprints
     app.register_blueprint(predict_bp, url_prefix='/api')
     app.register_blueprint(charts_bp, url_prefix='/api')
@@ -71,6 +167,7 @@ def create_app():
                 "charts": "/api/charts/<symbol>",
                 "dataset": "/api/dataset",
                 "predict": "/api/predict",
+                "predict_batch": "/api/predict/batch",
                 "stocks": "/api/stocks"
             }
         }), 200
@@ -4,14 +4,102 @@ import pandas as pd
 import numpy as np
 import json
 import os
+import time
 from datetime import datetime
 from sklearn.metrics import mean_squared_error, r2_score
-from utils.preprocessing import load_dataset
+from utils.preprocessing import load_dataset, get_dataset_schema, get_dataset_key, dataframe_to_records
 from utils.load_model import model_loader
 
 dashboard_bp = Blueprint('dashboard', __name__)
 logger = logging.getLogger(__name__)
 
+METRICS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "model_metrics.json")
+FALLBACK_METRICS_TTL = 300  # seconds before on-the-fly metrics are recomputed
+
+# Parsed metrics file keyed by mtime, and the last on-the-fly result
+_metrics_cache = {'mtime': None, 'data': None}
+_fallback_metrics_cache = {'expires': 0.0, 'metrics': (None, None)}
+
+# Stock changes only depend on the dataset, keyed by its (path, mtime)
+_stock_changes_cache = {'key': None, 'stocks': None}
+
+def load_saved_metrics():
+    """
+    Return the parsed metrics file, or None if it doesn't exist
+    
+    The file is only re-read when its modification time changes.
+    """
+    global _metrics_cache
+    try:
+        mtime = os.stat(METRICS_PATH).st_mtime
+    except FileNotFoundError:
+        return None
+    
+    cache = _metrics_cache
+    if cache['mtime'] != mtime:
+        with open(METRICS_PATH, 'r') as f:
+            metrics_data = json.load(f)
+        cache = {'mtime': mtime, 'data': metrics_data}
+        _metrics_cache = cache
+        logger.info(f"Loaded metrics from {METRICS_PATH}: MSE={metrics_data.get('mse')}, R²={metrics_data.get('r2')}")
+    
+    return cache['data']
+
+def calculate_metrics(df, symbol_column, date_column, price_col):
+    """
+    Calculate MSE and R2 of the model over the dataset
+    
+    The result (including a failed attempt) is reused for
+    FALLBACK_METRICS_TTL seconds. Returns (mse, r2), None where unavailable.
+    """
+    global _fallback_metrics_cache
+    cache = _fallback_metrics_cache
+    if time.monotonic() < cache['expires']:
+        return cache['metrics']
+    
+    mse = None
+    r2 = None
+    try:
+        model = model_loader.load_model()
+        label_map = model_loader.get_name_codes()
+        
+        # Build the feature matrix from column arrays (no copy of the frame)
+        # Feature order must match training: Date, Open, High, Low, Volume, Name, Close_lag1-3
+        n_lags = 3
+        value_cols = ['Open', 'High', 'Low', 'Volume']
+        if symbol_column and date_column and price_col and all(col in df.columns for col in value_cols):
+            # Convert Date to timestamp (as in training), NaN where missing
+            dates = df[date_column].to_numpy(dtype='datetime64[s]')
+            date_timestamps = np.where(np.isnat(dates), np.nan, dates.astype('int64'))
+            
+            # Encode stock names, NaN for stocks not in encoder
+            name_codes = df[symbol_column].map(label_map).to_numpy(dtype=float)
+            
+            # Lag features within each stock
+            grouped_prices = df.groupby(symbol_column, sort=False)[price_col]
+            lag_vals = [grouped_prices.shift(lag).to_numpy(dtype=float) for lag in range(1, n_lags + 1)]
+            
+            X_eval = np.column_stack(
+                [date_timestamps] + [df[col].to_numpy(dtype=float) for col in value_cols] + [name_codes] + lag_vals
+            )
+            y_eval = df[price_col].to_numpy(dtype=float)
+            
+            # Drop rows with missing features or target
+            valid_rows = ~np.isnan(X_eval).any(axis=1) & ~np.isnan(y_eval)
+            X_eval = X_eval[valid_rows]
+            y_eval = y_eval[valid_rows]
+            
+            if len(y_eval) > 0:
+                y_pred = model.predict(X_eval)
+                mse = float(mean_squared_error(y_eval, y_pred))
+                r2 = float(r2_score(y_eval, y_pred))
+                logger.info(f"Calculated metrics on the fly: MSE={mse}, R²={r2}")
+    except Exception as calc_error:
+        logger.warning(f"Could not calculate MSE/R2 on the fly: {str(calc_error)}")
+    
+    _fallback_metrics_cache = {'expires': time.monotonic() + FALLBACK_METRICS_TTL, 'metrics': (mse, r2)}
+    return mse, r2
+
 @dashboard_bp.route('/dashboard', methods=['GET'])
 def get_dashboard():
    
@@ -22,32 +110,27 @@ def get_dashboard():
         # Get total records
         total_records = len(df)
         
-        # Get unique stock count
-        symbol_column = None
-        if 'Name' in df.columns:
-            symbol_column = 'Name'
-        elif 'Symbol' in df.columns:
-            symbol_column = 'Symbol'
-        elif 'symbol' in df.columns:
-            symbol_column = 'symbol'
+        # Key columns are detected once when the dataset loads
+        schema = get_dataset_schema()
         
+        # Get unique stock count
+        symbol_column = schema.symbol_col
         total_stocks = df[symbol_column].nunique() if symbol_column else 0
         
         # Date range
-        date_column = 'Date' if 'Date' in df.columns else 'date' if 'date' in df.columns else None
+        date_column = schema.date_col
         date_range = {}
         
         if date_column:
-            df[date_column] = pd.to_datetime(df[date_column], errors='coerce')
+            dates = df[date_column]
             date_range = {
-                "start": df[date_column].min().strftime('%Y-%m-%d') if pd.notna(df[date_column].min()) else None,
-                "end": df[date_column].max().strftime('%Y-%m-%d') if pd.notna(df[date_column].max()) else None
+                "start": dates.min().strftime('%Y-%m-%d') if pd.notna(dates.min()) else None,
+                "end": dates.max().strftime('%Y-%m-%d') if pd.notna(dates.max()) else None
             }
         
         # Price statistics
         price_stats = {}
-        price_columns = ['Close', 'close', 'Price', 'price']
-        price_col = next((col for col in price_columns if col in df.columns), None)
+        price_col = schema.price_col
         
         if price_col:
             price_stats = {
@@ -78,68 +161,18 @@ def get_dashboard():
         # Load MSE and R2 from saved metrics file (created by file.py during training)
         mse = None
         r2 = None
-        metrics_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "model_metrics.json")
         
         try:
-            if os.path.exists(metrics_path):
-                with open(metrics_path, 'r') as f:
-                    metrics_data = json.load(f)
-                    mse = metrics_data.get('mse')
-                    r2 = metrics_data.get('r2')
-                    logger.info(f"Loaded metrics from {metrics_path}: MSE={mse}, R²={r2}")
+            metrics_data = load_saved_metrics()
+            if metrics_data is not None:
+                mse = metrics_data.get('mse')
+                r2 = metrics_data.get('r2')
             else:
-                logger.warning(f"Metrics file not found at {metrics_path}. Run file.py to generate metrics.")
+                logger.warning(f"Metrics file not found at {METRICS_PATH}. Run file.py to generate metrics.")
         except Exception as e:
             logger.warning(f"Could not load metrics from file: {str(e)}")
-            # Fallback: Try to calculate on the fly if file doesn't exist
-            try:
-                model = model_loader.load_model()
-                encoder = model_loader.load_label_encoder()
-                
-                # Prepare data for evaluation (similar to training)
-                eval_df = df.copy()
-                
-                # Convert Date to timestamp (as in training)
-                if date_column:
-                    eval_df[date_column] = pd.to_datetime(eval_df[date_column], errors='coerce')
-                    eval_df[date_column] = eval_df[date_column].astype("int64") // 10**9
-                
-                # Encode stock names (rename to 'Name' as in training)
-                if symbol_column and symbol_column != 'Name':
-                    eval_df['Name'] = eval_df[symbol_column]
-                
-                # Filter to only stocks in encoder
-                if 'Name' in eval_df.columns:
-                    valid_names = set(encoder.classes_)
-                    eval_df = eval_df[eval_df['Name'].isin(valid_names)]
-                    
-                    # Encode stock names
-                    eval_df['Name'] = eval_df['Name'].map(
-                        lambda x: encoder.transform([x])[0] if x in encoder.classes_ else -1
-                    )
-                    eval_df = eval_df[eval_df['Name'] != -1]
-                
-                # Create lag features (group by original symbol before encoding)
-                n_lags = 3
-                if symbol_column:
-                    for lag in range(1, n_lags + 1):
-                        eval_df[f"Close_lag{lag}"] = eval_df.groupby(symbol_column)[price_col].shift(lag)
-                
-                eval_df = eval_df.dropna()
-                
-                if len(eval_df) > 0:
-                    # Feature columns must match training: Date, Open, High, Low, Volume, Name, Close_lag1-3
-                    feature_cols = [date_column, 'Open', 'High', 'Low', 'Volume', 'Name'] + [f'Close_lag{i}' for i in range(1, n_lags + 1)]
-                    if all(col in eval_df.columns for col in feature_cols):
-                        X_eval = eval_df[feature_cols].astype(float)
-                        y_eval = eval_df[price_col].astype(float)
-                        
-                        y_pred = model.predict(X_eval)
-                        mse = float(mean_squared_error(y_eval, y_pred))
-                        r2 = float(r2_score(y_eval, y_pred))
-                        logger.info(f"Calculated metrics on the fly: MSE={mse}, R²={r2}")
-            except Exception as calc_error:
-                logger.warning(f"Could not calculate MSE/R2 on the fly: {str(calc_error)}")
+            # Fallback: Try to calculate on the fly if file can't be read
+            mse, r2 = calculate_metrics(df, symbol_column, date_column, price_col)
         
         # Last updated (use current time or last date in dataset)
         last_updated = date_range.get('end', datetime.now().strftime('%Y-%m-%d'))
@@ -197,21 +230,13 @@ def get_recent_data():
         df = load_dataset()
         
         # Sort by date if available
-        date_col = 'Date' if 'Date' in df.columns else 'date' if 'date' in df.columns else None
+        date_col = get_dataset_schema().date_col
         if date_col:
-            df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-            df = df.sort_values(by=date_col, ascending=False)
+            latest_index = df[date_col].sort_values(ascending=False).index[:10]
+            df = df.loc[latest_index]
         
         # Get last 10 records
-        recent = df.head(10).to_dict('records')
-        
-        # Clean data types
-        for record in recent:
-            for key, value in record.items():
-                if hasattr(value, 'item'):
-                    record[key] = value.item()
-                elif pd.isna(value):
-                    record[key] = None
+        recent = dataframe_to_records(df.head(10))
         
         return jsonify({
             "success": True,
@@ -229,71 +254,64 @@ def get_recent_data():
 
 @dashboard_bp.route('/dashboard/stock-changes', methods=['GET'])
 def get_stock_changes():
-    
+    global _stock_changes_cache
     try:
-        df = load_dataset()
+        dataset_key = get_dataset_key()
+        cache = _stock_changes_cache
+        if cache['key'] == dataset_key:
+            return jsonify({
+                "success": True,
+                "stocks": cache['stocks'],
+                "count": len(cache['stocks'])
+            }), 200
         
-        # Get symbol column
-        symbol_column = None
-        if 'Name' in df.columns:
-            symbol_column = 'Name'
-        elif 'Symbol' in df.columns:
-            symbol_column = 'Symbol'
-        elif 'symbol' in df.columns:
-            symbol_column = 'symbol'
+        df = load_dataset()
+        schema = get_dataset_schema()
         
+        symbol_column = schema.symbol_col
         if not symbol_column:
             return jsonify({
                 "success": False,
                 "error": "No symbol/name column found"
             }), 500
         
-        # Get date column
-        date_col = 'Date' if 'Date' in df.columns else 'date'
-        if date_col not in df.columns:
+        date_col = schema.date_col
+        if not date_col:
             return jsonify({
                 "success": False,
                 "error": "No date column found"
             }), 500
         
-        # Get price column
-        price_col = 'Close' if 'Close' in df.columns else 'close'
-        if price_col not in df.columns:
+        price_col = schema.close_col
+        if not price_col:
             return jsonify({
                 "success": False,
                 "error": "No close price column found"
             }), 500
         
-        # Convert date to datetime
-        df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-        df = df.sort_values(by=[symbol_column, date_col])
+        df = df[[symbol_column, date_col, price_col]].dropna(subset=[date_col, price_col]).sort_values(by=[symbol_column, date_col])
         
-        # Get latest and previous prices for each stock
-        stock_changes = []
-        for stock_name in df[symbol_column].unique():
-            stock_df = df[df[symbol_column] == stock_name].dropna(subset=[date_col, price_col])
-            if len(stock_df) < 2:
-                continue
-            
-            # Get last two records
-            last_two = stock_df.tail(2)
-            current_price = float(last_two.iloc[-1][price_col])
-            previous_price = float(last_two.iloc[-2][price_col])
-            
-            change = current_price - previous_price
-            change_percent = (change / previous_price * 100) if previous_price != 0 else 0
-            
-            stock_changes.append({
-                "name": stock_name,
-                "current_price": round(current_price, 2),
-                "previous_price": round(previous_price, 2),
-                "change": round(change, 2),
-                "change_percent": round(change_percent, 2),
-                "direction": "up" if change >= 0 else "down"
-            })
+        # Get latest and previous prices for each stock in one grouped pass
+        previous_prices = df.groupby(symbol_column, sort=False)[price_col].shift(1)
+        is_latest = ~df[symbol_column].duplicated(keep='last')
+        latest = pd.DataFrame({
+            "name": df.loc[is_latest, symbol_column],
+            "current_price": df.loc[is_latest, price_col],
+            "previous_price": previous_prices[is_latest]
+        }).dropna(subset=["previous_price"])
+        
+        current_prices = latest["current_price"].to_numpy(dtype=float)
+        previous = latest["previous_price"].to_numpy(dtype=float)
+        change = current_prices - previous
+        change_percent = np.divide(change, previous, out=np.zeros_like(change), where=previous != 0) * 100
+        
+        latest = latest.assign(change=change, change_percent=change_percent).round(2)
+        latest["direction"] = np.where(change >= 0, "up", "down")
         
         # Sort by absolute change percentage (most volatile first)
-        stock_changes.sort(key=lambda x: abs(x['change_percent']), reverse=True)
+        latest = latest.sort_values(by="change_percent", key=abs, ascending=False, kind="stable")
+        stock_changes = latest.to_dict('records')
+        _stock_changes_cache = {'key': dataset_key, 'stocks': stock_changes}
         
         # Return ALL stocks (no limit) for infinite loop slideshow
         return jsonify({
@@ -1,11 +1,42 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app
+import hashlib
 import logging
 import pandas as pd
-from utils.preprocessing import load_dataset, get_dataset_summary
+from utils.preprocessing import load_dataset, get_dataset_schema, get_dataset_key, get_symbol_positions, get_search_text, get_dataset_summary, dataframe_to_records
 
 dataset_bp = Blueprint('dataset', __name__)
 logger = logging.getLogger(__name__)
 
+# Serialized /dataset/columns and /dataset/stats bodies, keyed by the dataset's (path, mtime)
+_response_cache = {'key': None}
+
+def cached_dataset_response(name, build):
+    """
+    Return a JSON response for a payload that only depends on the dataset
+    
+    build() returns (payload, status) and runs once per dataset version; the
+    serialized body is reused and served with ETag/Last-Modified headers.
+    """
+    global _response_cache
+    dataset_key = get_dataset_key()
+    cache = _response_cache
+    if cache['key'] != dataset_key:
+        cache = {'key': dataset_key}
+        _response_cache = cache
+    
+    if name not in cache:
+        payload, status = build()
+        body = jsonify(payload).get_data()
+        cache[name] = (body, status, hashlib.sha1(body).hexdigest())
+    
+    body, status, etag = cache[name]
+    response = current_app.response_class(body, status=status, mimetype='application/json')
+    if status == 200:
+        response.set_etag(etag)
+        response.last_modified = dataset_key[1]
+        response = response.make_conditional(request)
+    return response
+
 @dataset_bp.route('/dataset', methods=['GET'])
 def get_dataset():
     """
@@ -38,52 +69,43 @@ def get_dataset():
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         
-        # Identify columns
-        symbol_column = None
-        if 'Name' in df.columns:
-            symbol_column = 'Name'
-        elif 'Symbol' in df.columns:
-            symbol_column = 'Symbol'
-        elif 'symbol' in df.columns:
-            symbol_column = 'symbol'
-        
-        date_col = None
-        if 'Date' in df.columns:
-            date_col = 'Date'
-        elif 'date' in df.columns:
-            date_col = 'date'
-        
-        # Apply symbol filter (case-insensitive)
+        # Identify columns (detected once when the dataset loads)
+        schema = get_dataset_schema()
+        symbol_column = schema.symbol_col
+        date_col = schema.date_col
+        
+        summary_requested = request.args.get('summary', '').lower() == 'true'
+        
+        # Apply symbol filter (case-insensitive) from the prebuilt symbol index.
+        # Without other filters only the requested page of its rows is taken.
+        symbol_positions = None
         if symbol and symbol_column and symbol.lower() != 'all':
-            df[symbol_column] = df[symbol_column].astype(str)
-            df = df[df[symbol_column].str.upper() == symbol.upper()]
+            symbol_positions = get_symbol_positions(symbol)
+            if (date_col and (start_date or end_date)) or search or summary_requested:
+                df = df.iloc[symbol_positions]
+                symbol_positions = None
         
         # Apply date filters
         if date_col and (start_date or end_date):
-            df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
+            dates = df[date_col]
+            date_mask = pd.Series(True, index=df.index)
             if start_date:
                 start_dt = pd.to_datetime(start_date, errors='coerce')
                 if pd.notna(start_dt):
-                    df = df[df[date_col] >= start_dt]
+                    date_mask &= dates >= start_dt
             if end_date:
                 end_dt = pd.to_datetime(end_date, errors='coerce')
                 if pd.notna(end_dt):
-                    df = df[df[date_col] <= end_dt]
+                    date_mask &= dates <= end_dt
+            df = df[date_mask]
         
         # Apply search filter across all columns
         if search:
-            search_lower = search.lower()
-            df = df[
-                df.apply(
-                    lambda row: search_lower in ' '.join(
-                        [str(value).lower() for value in row.values if value is not None]
-                    ),
-                    axis=1
-                )
-            ]
+            search_text = get_search_text().reindex(df.index)
+            df = df[search_text.str.contains(search.lower(), regex=False, na=False)]
         
         # Check if summary requested
-        if request.args.get('summary', '').lower() == 'true':
+        if summary_requested:
             summary = get_dataset_summary(df)
             return jsonify({
                 "success": True,
@@ -108,24 +130,17 @@ def get_dataset():
             }), 400
         
         # Calculate pagination
-        total_rows = len(df)
+        total_rows = len(df) if symbol_positions is None else len(symbol_positions)
         total_pages = (total_rows + per_page - 1) // per_page
         start_idx = (page - 1) * per_page
         end_idx = start_idx + per_page
         
-        # Get page data
-        page_df = df.iloc[start_idx:end_idx]
-        
-        # Convert to dict
-        data = page_df.to_dict('records')
-        
-        # Clean data types
-        for record in data:
-            for key, value in record.items():
-                if hasattr(value, 'item'):
-                    record[key] = value.item()
-                elif pd.isna(value):
-                    record[key] = None
+        # Slice the page first, then convert it (NaN becomes None)
+        if symbol_positions is not None:
+            page_df = df.iloc[symbol_positions[start_idx:end_idx]]
+        else:
+            page_df = df.iloc[start_idx:end_idx]
+        data = dataframe_to_records(page_df)
         
         logger.info(f"Fetched page {page} ({len(data)} records)")
         
@@ -169,15 +184,16 @@ def get_columns():
         "count": 6
     }
     """
-    try:
-        df = load_dataset()
-        columns = df.columns.tolist()
-        
-        return jsonify({
+    def build():
+        columns = load_dataset().columns.tolist()
+        return {
             "success": True,
             "columns": columns,
             "count": len(columns)
-        }), 200
+        }, 200
+    
+    try:
+        return cached_dataset_response('columns', build)
     
     except Exception as e:
         logger.error(f"Error fetching columns: {str(e)}")
@@ -201,31 +217,24 @@ def get_statistics():
         }
     }
     """
-    try:
-        df = load_dataset()
-        
+    def build():
         # Get numeric columns only
-        numeric_df = df.select_dtypes(include=['number'])
+        numeric_df = load_dataset().select_dtypes(include=['number'])
         
         if numeric_df.empty:
-            return jsonify({
+            return {
                 "success": False,
                 "error": "No numeric columns found"
-            }), 400
-        
-        # Generate statistics
-        stats = numeric_df.describe().to_dict()
+            }, 400
         
-        # Clean stats (convert numpy types)
-        for col in stats:
-            for stat in stats[col]:
-                if hasattr(stats[col][stat], 'item'):
-                    stats[col][stat] = stats[col][stat].item()
-        
-        return jsonify({
+        # Generate statistics (to_dict already returns native Python floats)
+        return {
             "success": True,
-            "statistics": stats
-        }), 200
+            "statistics": numeric_df.describe().to_dict()
+        }, 200
+    
+    try:
+        return cached_dataset_response('stats', build)
     
     except Exception as e:
         logger.error(f"Error generating statistics: {str(e)}")
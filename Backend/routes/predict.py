@@ -1,12 +1,19 @@
 from flask import Blueprint, request, jsonify
 import logging
+import numpy as np
 import pandas as pd
 from utils.load_model import model_loader
-from utils.preprocessing import preprocess_prediction_input, load_dataset
+from utils.preprocessing import preprocess_prediction_input, preprocess_prediction_batch, get_dataset_schema, get_dataset_key, get_dataset_stocks, find_symbol_row
 
 predict_bp = Blueprint('predict', __name__)
 logger = logging.getLogger(__name__)
 
+# Combined dataset and encoder stock list, keyed by the dataset's (path, mtime)
+_stocks_cache = {'key': None, 'stocks': None}
+
+# Upper bound on inputs accepted by /predict/batch
+MAX_BATCH_ITEMS = 1000
+
 @predict_bp.route('/predict', methods=['POST'])
 def predict():
     try:
@@ -66,36 +73,95 @@ def predict():
             "details": str(e)
         }), 500
 
+@predict_bp.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Predict many inputs with a single model call
+    
+    Expects {"items": [...]} where each item has the /predict input format.
+    Returns the predictions in the same order as the items.
+    """
+    try:
+        if not request.is_json:
+            return jsonify({
+                "success": False,
+                "error": "Content-Type must be application/json"
+            }), 400
+        
+        data = request.get_json()
+        items = data.get('items') if isinstance(data, dict) else None
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({
+                "success": False,
+                "error": "Provide a non-empty 'items' list"
+            }), 400
+        
+        if len(items) > MAX_BATCH_ITEMS:
+            return jsonify({
+                "success": False,
+                "error": f"At most {MAX_BATCH_ITEMS} items per batch"
+            }), 400
+        
+        # Load model
+        model = model_loader.load_model()
+        
+        # Preprocess all items into one feature matrix (lags looked up per symbol)
+        features = preprocess_prediction_batch(items)
+        
+        # Make all predictions in one call
+        predictions = np.asarray(model.predict(features), dtype=float)
+        
+        logger.info(f"Batch prediction successful for {len(items)} items")
+        
+        return jsonify({
+            "success": True,
+            "predictions": [
+                {"symbol": item.get('symbol'), "prediction": round(float(value), 2)}
+                for item, value in zip(items, predictions)
+            ],
+            "count": len(items)
+        }), 200
+    
+    except ValueError as ve:
+        logger.warning(f"Validation error: {str(ve)}")
+        return jsonify({
+            "success": False,
+            "error": str(ve)
+        }), 400
+    
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": "Prediction failed",
+            "details": str(e)
+        }), 500
+
 @predict_bp.route('/stocks', methods=['GET'])
 def get_stocks():
-
+    global _stocks_cache
     try:
-        # First try to get from dataset (includes all stocks)
-        df = load_dataset()
-        
-        # Get symbol column
-        symbol_column = None
-        if 'Name' in df.columns:
-            symbol_column = 'Name'
-        elif 'Symbol' in df.columns:
-            symbol_column = 'Symbol'
-        elif 'symbol' in df.columns:
-            symbol_column = 'symbol'
-        
-        if symbol_column:
-            # Get all unique stocks from dataset
-            dataset_stocks = sorted(df[symbol_column].unique().tolist())
+        dataset_key = get_dataset_key()
+        cache = _stocks_cache
+        if cache['key'] == dataset_key:
+            all_stocks = cache['stocks']
         else:
-            dataset_stocks = []
-        
-        # Also get from encoder (for model compatibility)
-        try:
-            encoder_stocks = model_loader.get_stock_names()
-        except:
-            encoder_stocks = []
-        
-        # Combine both lists and remove duplicates
-        all_stocks = sorted(list(set(dataset_stocks + encoder_stocks)))
+            # First get from dataset (includes all stocks, precomputed at load)
+            dataset_stocks = get_dataset_stocks()
+            
+            # Also get from encoder (for model compatibility)
+            try:
+                encoder_stocks = model_loader.get_stock_names()
+            except:
+                encoder_stocks = None
+            
+            # Combine both lists and remove duplicates
+            all_stocks = sorted(set(dataset_stocks + (encoder_stocks or [])))
+            
+            # Only keep the list once the encoder could be read
+            if encoder_stocks is not None:
+                _stocks_cache = {'key': dataset_key, 'stocks': all_stocks}
         
         return jsonify({
             "success": True,
@@ -161,34 +227,22 @@ def fetch_stock_data():
         symbol = data.get('symbol')
         date_str = data.get('date')
         
-        # Load dataset
-        df = load_dataset()
+        # Key columns are detected once when the dataset loads
+        schema = get_dataset_schema()
         
-        # Get symbol column
-        symbol_column = None
-        if 'Name' in df.columns:
-            symbol_column = 'Name'
-        elif 'Symbol' in df.columns:
-            symbol_column = 'Symbol'
-        elif 'symbol' in df.columns:
-            symbol_column = 'symbol'
-        
-        if not symbol_column:
+        if not schema.symbol_col:
             return jsonify({
                 "success": False,
                 "error": "No symbol/name column found in dataset"
             }), 500
         
-        # Get date column
-        date_col = 'Date' if 'Date' in df.columns else 'date'
-        if date_col not in df.columns:
+        if not schema.date_col:
             return jsonify({
                 "success": False,
                 "error": "No date column found in dataset"
             }), 500
         
-        # Convert date to datetime
-        df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
+        # Dataset dates are parsed at load; only the requested date needs parsing
         search_date = pd.to_datetime(date_str, errors='coerce')
         
         if pd.isna(search_date):
@@ -197,31 +251,15 @@ def fetch_stock_data():
                 "error": "Invalid date format. Use YYYY-MM-DD"
             }), 400
         
-        # Filter by symbol and date
-        filtered = df[
-            (df[symbol_column].str.upper() == symbol.upper()) &
-            (df[date_col].dt.date == search_date.date())
-        ]
-        
-        if filtered.empty:
-            # Try to get the closest date (previous day)
-            stock_df = df[df[symbol_column].str.upper() == symbol.upper()].copy()
-            if len(stock_df) > 0:
-                stock_df = stock_df.sort_values(by=date_col, ascending=False)
-                # Get the most recent record before or on the requested date
-                stock_df = stock_df[stock_df[date_col] <= search_date]
-                if len(stock_df) > 0:
-                    filtered = stock_df.head(1)
-        
-        if filtered.empty:
+        # Record on the requested date, or the closest previous one
+        record = find_symbol_row(symbol, search_date)
+        
+        if record is None:
             return jsonify({
                 "success": False,
                 "error": f"No data found for {symbol} on {date_str}"
             }), 404
         
-        # Get the first matching record
-        record = filtered.iloc[0]
-        
         # Extract OHLCV data
         result = {
             "open": float(record.get('Open', record.get('open', 0))),
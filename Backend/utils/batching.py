@@ -0,0 +1,108 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import numpy as np
+
+from utils.load_model import model_loader
+
+logger = logging.getLogger(__name__)
+
+class PredictionBatcher:
+    """
+    Merge concurrent prediction requests into a single model.predict call
+
+    Callers submit a 2D feature array and block until their slice of the
+    batched result is ready. A background worker collects whatever is
+    queued (waiting at most max_delay seconds for more) and predicts once.
+    Callers wait at most timeout seconds before predicting on their own.
+    """
+
+    def __init__(self, max_batch_rows=50000, max_delay=0.002, timeout=5.0):
+        self.max_batch_rows = max_batch_rows
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._queue = None
+        self._worker = None
+        self._worker_pid = None
+
+    def predict(self, features):
+        """Return model predictions for a 2D feature array"""
+        features = np.asarray(features, dtype=float)
+        if len(features) == 0:
+            return np.empty(0)
+
+        future = Future()
+        self._get_queue().put((features, future))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # The worker is stuck or gone; answer this request directly instead of hanging
+            logger.warning(f"Batched prediction timed out after {self.timeout}s, predicting directly")
+            model = model_loader.load_model()
+            return np.asarray(model.predict(features), dtype=float)
+
+    def _get_queue(self):
+        """Return the request queue, starting the worker thread if needed"""
+        with self._lock:
+            # Threads do not survive a fork, so each process starts its own
+            # worker; a worker that died is replaced as well
+            if self._worker is None or self._worker_pid != os.getpid() or not self._worker.is_alive():
+                self._queue = queue.Queue()
+                self._worker = threading.Thread(
+                    target=self._run, args=(self._queue,), name='prediction-batcher', daemon=True
+                )
+                self._worker_pid = os.getpid()
+                self._worker.start()
+            return self._queue
+
+    def _run(self, requests):
+        while True:
+            batch = [requests.get()]
+            batch_rows = len(batch[0][0])
+            deadline = time.monotonic() + self.max_delay
+
+            # Collect pending requests until the batch is full or the delay expires
+            while batch_rows < self.max_batch_rows:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = requests.get(timeout=timeout) if timeout > 0 else requests.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+                batch_rows += len(item[0])
+
+            self._predict_batch(batch)
+
+    def _predict_batch(self, batch):
+        try:
+            model = model_loader.load_model()
+            predictions = np.asarray(model.predict(np.vstack([features for features, _ in batch])), dtype=float)
+        except Exception as e:
+            if len(batch) == 1:
+                logger.error(f"Prediction failed: {str(e)}")
+                batch[0][1].set_exception(e)
+                return
+            
+            # Keep requests isolated: retry each on its own so only the ones
+            # whose features fail get the error
+            logger.warning(f"Batched prediction failed for {len(batch)} requests, retrying separately: {str(e)}")
+            for item in batch:
+                self._predict_batch([item])
+            return
+
+        if len(batch) > 1:
+            logger.debug(f"Merged {len(batch)} requests into one prediction of {len(predictions)} rows")
+
+        # Hand each caller its slice of the batched result
+        offset = 0
+        for features, future in batch:
+            future.set_result(predictions[offset:offset + len(features)])
+            offset += len(features)
+
+# Global instance
+prediction_batcher = PredictionBatcher()
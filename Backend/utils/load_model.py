@@ -1,14 +1,34 @@
-import pickle
+import joblib
+import numpy as np
 import os
 import logging
 
+try:
+    import onnxruntime
+except ImportError:  # Optional: predictions use the joblib model
+    onnxruntime = None
+
 logger = logging.getLogger(__name__)
 
+class OnnxModel:
+    """Model exported to ONNX (see file.py), run with onnxruntime behind predict()"""
+    
+    def __init__(self, model_path):
+        self._session = onnxruntime.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+        self._input_name = self._session.get_inputs()[0].name
+    
+    def predict(self, features):
+        """Return predictions for a 2D feature array"""
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        return self._session.run(None, {self._input_name: features})[0].ravel()
+
 class ModelLoader:
     """Singleton class to load and cache ML models"""
     _instance = None
     _model = None
     _label_encoder = None
+    _name_to_code = None
+    _code_to_name = None
     
     def __new__(cls):
         if cls._instance is None:
@@ -27,8 +47,21 @@ class ModelLoader:
                 if not os.path.exists(model_path):
                     raise FileNotFoundError(f"Model file not found: {model_path}")
                 
-                with open(model_path, 'rb') as f:
-                    self._model = pickle.load(f)
+                # Prefer the ONNX export when onnxruntime is installed and the
+                # export is not older than the model it was made from
+                onnx_path = os.path.splitext(model_path)[0] + '.onnx'
+                if onnxruntime is not None and os.path.exists(onnx_path) and \
+                        os.path.getmtime(onnx_path) >= os.path.getmtime(model_path):
+                    try:
+                        self._model = OnnxModel(onnx_path)
+                        logger.info(f"Model loaded successfully from {onnx_path}")
+                        return self._model
+                    except Exception as e:
+                        logger.warning(f"Could not load ONNX model, using {model_path}: {str(e)}")
+                
+                # Reads both joblib.dump and plain pickle files. Workers share
+                # the loaded model copy-on-write when the app is preloaded (see wsgi.py)
+                self._model = joblib.load(model_path)
                 
                 logger.info(f"Model loaded successfully from {model_path}")
             except Exception as e:
@@ -49,8 +82,13 @@ class ModelLoader:
                 if not os.path.exists(encoder_path):
                     raise FileNotFoundError(f"Label encoder not found: {encoder_path}")
                 
-                with open(encoder_path, 'rb') as f:
-                    self._label_encoder = pickle.load(f)
+                encoder = joblib.load(encoder_path)
+                
+                # Plain lookups for encoding, built once from the encoder's classes
+                classes = encoder.classes_.tolist() if hasattr(encoder, 'classes_') else []
+                self._code_to_name = classes
+                self._name_to_code = {name: code for code, name in enumerate(classes)}
+                self._label_encoder = encoder
                 
                 logger.info(f"Label encoder loaded successfully from {encoder_path}")
             except Exception as e:
@@ -73,22 +111,27 @@ class ModelLoader:
             logger.error(f"Error getting stock names: {str(e)}")
             return []
     
+    def get_name_codes(self):
+        """Get the {stock name: encoded value} mapping of the label encoder"""
+        self.load_label_encoder()
+        return self._name_to_code
+    
     def encode_stock_name(self, stock_name):
         """Encode stock name to numeric value"""
-        encoder = self.load_label_encoder()
-        try:
-            encoded = encoder.transform([stock_name])[0]
-            return encoded
-        except Exception as e:
-            logger.error(f"Error encoding stock name '{stock_name}': {str(e)}")
+        encoded = self.get_name_codes().get(stock_name)
+        if encoded is None:
+            logger.error(f"Error encoding stock name '{stock_name}': not a known stock")
             raise ValueError(f"Invalid stock name: {stock_name}")
+        return encoded
     
     def decode_stock_name(self, encoded_value):
         """Decode numeric value to stock name"""
-        encoder = self.load_label_encoder()
+        self.load_label_encoder()
         try:
-            decoded = encoder.inverse_transform([encoded_value])[0]
-            return decoded
+            code = int(encoded_value)
+            if code < 0 or code != encoded_value:
+                raise IndexError(code)
+            return self._code_to_name[code]
         except Exception as e:
             logger.error(f"Error decoding stock value '{encoded_value}': {str(e)}")
             raise ValueError(f"Invalid encoded value: {encoded_value}")
@@ -1,10 +1,67 @@
 import pandas as pd
 import numpy as np
+import functools
 import logging
+import os
+import importlib.util
+from datetime import datetime
+from dataclasses import dataclass
+from typing import Optional
 from utils.load_model import model_loader
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # Optional: fall back to pandas' CSV parser
+    pa_csv = None
+
+try:
+    import numba
+except ImportError:  # Optional: the lag kernel runs as plain Python/numpy
+    numba = None
+
 logger = logging.getLogger(__name__)
 
+# Previous-day close features used by the model
+LAG_COLUMNS = ['Close_lag1', 'Close_lag2', 'Close_lag3']
+
+# Date format used in dataset.csv, e.g. "Oct 09, 2025"
+DATASET_DATE_FORMAT = '%b %d, %Y'
+
+# Accepted names for the dataset's key columns, in order of preference
+SYMBOL_COLUMNS = ('Name', 'Symbol', 'symbol')
+DATE_COLUMNS = ('Date', 'date')
+CLOSE_COLUMNS = ('Close', 'close')
+PRICE_COLUMNS = ('Close', 'close', 'Price', 'price')
+
+@dataclass(frozen=True)
+class DatasetSchema:
+    """Names of the dataset's key columns (None where the column is missing)"""
+    symbol_col: Optional[str] = None
+    date_col: Optional[str] = None
+    close_col: Optional[str] = None
+    price_col: Optional[str] = None
+    
+    @classmethod
+    def detect(cls, df):
+        """Detect the key columns of a DataFrame"""
+        def first_present(names):
+            return next((col for col in names if col in df.columns), None)
+        
+        return cls(
+            symbol_col=first_present(SYMBOL_COLUMNS),
+            date_col=first_present(DATE_COLUMNS),
+            close_col=first_present(CLOSE_COLUMNS),
+            price_col=first_present(PRICE_COLUMNS)
+        )
+
+# Parsed dataset, rebuilt when the file changes; callers must not mutate it
+_dataset_cache = {
+    'key': None, 'df': None, 'schema': DatasetSchema(), 'symbol_index': {}, 'symbol_history': {}, 'symbol_days': {},
+    'symbol_closes': {},
+    'close_lags': None, 'date_order': None, 'search_text': None, 'stocks': []
+}
+
 def preprocess_prediction_input(data):
     """
     Preprocess input data for prediction
@@ -57,7 +114,6 @@ def preprocess_prediction_input(data):
             date_timestamp = int(date_obj.timestamp())
         else:
             # Default to current date
-            from datetime import datetime
             date_timestamp = int(datetime.now().timestamp())
         
         # Get lag features (previous 3 days' close prices)
@@ -68,24 +124,20 @@ def preprocess_prediction_input(data):
             current_close=data.get('close')
         )
         
-        # Create feature array in EXACT order as training:
+        # Fill a single-row feature array in EXACT order as training:
         # Date, Open, High, Low, Volume, Name, Close_lag1, Close_lag2, Close_lag3
-        features = [
-            float(date_timestamp),  # Date (UNIX timestamp)
-            float(data['open']),    # Open
-            float(data['high']),    # High
-            float(data['low']),     # Low
-            float(data['volume']),  # Volume
-            float(encoded_symbol),  # Name (encoded)
-            float(lag_features['Close_lag1']),  # Close_lag1
-            float(lag_features['Close_lag2']),  # Close_lag2
-            float(lag_features['Close_lag3'])   # Close_lag3
-        ]
-        
-        # Convert to numpy array and reshape for single prediction
-        feature_array = np.array(features).reshape(1, -1)
-        
-        logger.info(f"Preprocessed input for {data['symbol']}: {len(features)} features")
+        feature_array = np.empty((1, 9))
+        feature_array[0, 0] = date_timestamp              # Date (UNIX timestamp)
+        feature_array[0, 1] = float(data['open'])         # Open
+        feature_array[0, 2] = float(data['high'])         # High
+        feature_array[0, 3] = float(data['low'])          # Low
+        feature_array[0, 4] = float(data['volume'])       # Volume
+        feature_array[0, 5] = encoded_symbol              # Name (encoded)
+        feature_array[0, 6] = lag_features['Close_lag1']  # Close_lag1
+        feature_array[0, 7] = lag_features['Close_lag2']  # Close_lag2
+        feature_array[0, 8] = lag_features['Close_lag3']  # Close_lag3
+        
+        logger.info(f"Preprocessed input for {data['symbol']}: {feature_array.shape[1]} features")
         logger.debug(f"Features: Date={date_timestamp}, Open={data['open']}, High={data['high']}, Low={data['low']}, Volume={data['volume']}, Name={encoded_symbol}, Lags={lag_features}")
         
         return feature_array
@@ -97,6 +149,128 @@ def preprocess_prediction_input(data):
         logger.error(f"Error preprocessing input: {str(e)}")
         raise ValueError(f"Preprocessing failed: {str(e)}")
 
+def preprocess_prediction_batch(items):
+    """
+    Preprocess many prediction inputs into one float32 feature matrix
+    
+    Each item has the preprocess_prediction_input format and gives one row,
+    in the same feature order. Lag features are looked up for all items at
+    once, per symbol, with the same rules as get_lag_features. Invalid items
+    raise ValueError naming the item's index.
+    """
+    codes = model_loader.get_name_codes()
+    n_items = len(items)
+    features = np.empty((n_items, 9), dtype=np.float32)
+    befores = np.full(n_items, np.iinfo(np.int64).max, dtype=np.int64)
+    symbols = []
+    now_timestamp = int(datetime.now().timestamp())
+    
+    # Parse every distinct date string in one call
+    parsed_dates = _parse_request_dates([
+        data.get('date') or data.get('Date') for data in items if isinstance(data, dict)
+    ])
+    
+    required_fields = ['symbol', 'open', 'high', 'low', 'volume']
+    for i, data in enumerate(items):
+        if not isinstance(data, dict):
+            raise ValueError(f"Item {i} must be an object")
+        
+        missing_fields = [field for field in required_fields if field not in data]
+        if missing_fields:
+            raise ValueError(f"Item {i}: Missing required fields: {', '.join(missing_fields)}")
+        
+        encoded_symbol = codes.get(data['symbol'])
+        if encoded_symbol is None:
+            raise ValueError(f"Item {i}: Invalid stock symbol: {data['symbol']}")
+        
+        date_str = data.get('date') or data.get('Date')
+        date_timestamp = now_timestamp
+        if date_str:
+            if isinstance(date_str, str):
+                date_obj = parsed_dates[date_str]
+            else:
+                date_obj = pd.to_datetime(date_str, errors='coerce')
+            if pd.isna(date_obj):
+                raise ValueError(f"Item {i}: Invalid date format: {date_str}. Use YYYY-MM-DD")
+            date_timestamp = int(date_obj.timestamp())
+            befores[i] = date_obj.to_datetime64().astype('datetime64[ns]').astype(np.int64)
+        
+        try:
+            features[i, :6] = (
+                date_timestamp, float(data['open']), float(data['high']),
+                float(data['low']), float(data['volume']), encoded_symbol
+            )
+        except Exception as e:
+            raise ValueError(f"Item {i}: Preprocessing failed: {str(e)}")
+        symbols.append(str(data['symbol']).upper())
+    
+    features[:, 6:] = _get_lag_matrix(symbols, befores, [data.get('close') for data in items])
+    
+    logger.info(f"Preprocessed {n_items} inputs for batch prediction")
+    return features
+
+def _parse_request_dates(values):
+    """
+    Return {date string: Timestamp or NaT} for the strings in values
+    
+    The distinct strings are parsed together, as UTC so naive and zoned
+    strings can share one array (only the UTC instant is used). Any that come
+    back missing are parsed one at a time as preprocess_prediction_input does.
+    """
+    date_strs = list(dict.fromkeys(value for value in values if isinstance(value, str) and value))
+    parsed = {}
+    try:
+        dates = pd.to_datetime(pd.Index(date_strs, dtype=object), errors='coerce', format='mixed', utc=True)
+        parsed = {date_str: date for date_str, date in zip(date_strs, dates) if not pd.isna(date)}
+    except Exception:
+        pass
+    
+    for date_str in date_strs:
+        if date_str not in parsed:
+            parsed[date_str] = pd.to_datetime(date_str, errors='coerce')
+    return parsed
+
+def _get_lag_matrix(symbols, befores, current_closes):
+    """
+    Return the (n, 3) Close_lag1..3 values for each (symbol, before) pair
+    
+    Vectorized form of get_lag_features: each symbol's items are looked up
+    with one searchsorted over its date-sorted closes, and rows without
+    history fall back to get_default_lags.
+    """
+    n_items = len(symbols)
+    lags = np.zeros((n_items, len(LAG_COLUMNS)))
+    
+    cache = _get_dataset_cache()
+    schema = cache['schema']
+    if schema.symbol_col and schema.date_col and schema.close_col:
+        symbol_closes = cache['symbol_closes']
+        item_symbols = np.array(symbols, dtype=object)
+        for symbol in set(symbols):
+            history = symbol_closes.get(symbol)
+            if history is None:
+                continue
+            
+            dates, closes = history
+            valid = ~np.isnan(closes)
+            dates, closes = dates[valid], closes[valid]
+            
+            # Number of closes dated before each item's date; lag k is the k-th latest
+            rows = np.flatnonzero(item_symbols == symbol)
+            counts = np.searchsorted(dates, befores[rows], side='left')
+            for k in range(len(LAG_COLUMNS)):
+                has_lag = counts > k
+                lags[rows[has_lag], k] = closes[counts[has_lag] - k - 1]
+        
+        # Lags that are still zero take the most recent close (Close_lag1)
+        lags = np.where(lags == 0.0, lags[:, :1], lags)
+    
+    # Items without a usable close history get the default lags
+    for i in np.flatnonzero(lags[:, 0] == 0.0):
+        lags[i] = list(get_default_lags(current_closes[i]).values())
+    
+    return lags
+
 def get_lag_features(symbol, date_str=None, current_close=None):
     """
     Get lag features (previous 3 days' close prices) from dataset
@@ -105,57 +279,10 @@ def get_lag_features(symbol, date_str=None, current_close=None):
     If not available in dataset, uses current_close or estimates
     """
     try:
-        df = load_dataset()
-        
-        # Get symbol column
-        symbol_column = None
-        if 'Name' in df.columns:
-            symbol_column = 'Name'
-        elif 'Symbol' in df.columns:
-            symbol_column = 'Symbol'
-        elif 'symbol' in df.columns:
-            symbol_column = 'symbol'
-        
-        if not symbol_column:
-            logger.warning("No symbol column found, using default lag values")
-            return get_default_lags(current_close)
-        
-        # Filter by symbol (case-insensitive)
-        df[symbol_column] = df[symbol_column].astype(str)
-        stock_df = df[df[symbol_column].str.upper() == symbol.upper()].copy()
-        
-        if stock_df.empty:
-            logger.warning(f"No historical data found for {symbol}, using default lag values")
-            return get_default_lags(current_close)
-        
-        # Get date column
-        date_col = 'Date' if 'Date' in df.columns else 'date'
-        if date_col not in stock_df.columns:
-            logger.warning("No date column found, using default lag values")
-            return get_default_lags(current_close)
-        
-        # Get close column
-        close_col = 'Close' if 'Close' in stock_df.columns else 'close'
-        if close_col not in stock_df.columns:
-            logger.warning("No close column found, using default lag values")
-            return get_default_lags(current_close)
-        
-        # Convert date to datetime and sort
-        stock_df[date_col] = pd.to_datetime(stock_df[date_col], errors='coerce')
-        stock_df = stock_df.sort_values(by=date_col, ascending=False)
-        stock_df = stock_df.dropna(subset=[date_col, close_col])
-        
-        if len(stock_df) == 0:
-            logger.warning(f"No valid data found for {symbol}, using default lag values")
+        recent_closes = _get_recent_closes(str(symbol).upper(), date_str or '', get_dataset_key())
+        if recent_closes is None:
             return get_default_lags(current_close)
         
-        # Get the most recent close prices (excluding current date if provided)
-        if date_str:
-            date_obj = pd.to_datetime(date_str, errors='coerce')
-            if not pd.isna(date_obj):
-                # Get data before the prediction date
-                stock_df = stock_df[stock_df[date_col] < date_obj]
-        
         # Extract lag features from historical data
         lags = {
             'Close_lag1': 0.0,
@@ -163,16 +290,16 @@ def get_lag_features(symbol, date_str=None, current_close=None):
             'Close_lag3': 0.0
         }
         
-        if len(stock_df) >= 1:
-            lags['Close_lag1'] = float(stock_df.iloc[0][close_col])
-        if len(stock_df) >= 2:
-            lags['Close_lag2'] = float(stock_df.iloc[1][close_col])
-        if len(stock_df) >= 3:
-            lags['Close_lag3'] = float(stock_df.iloc[2][close_col])
+        if len(recent_closes) >= 1:
+            lags['Close_lag1'] = recent_closes[0]
+        if len(recent_closes) >= 2:
+            lags['Close_lag2'] = recent_closes[1]
+        if len(recent_closes) >= 3:
+            lags['Close_lag3'] = recent_closes[2]
         
         # If we have fewer than 3 historical values, use the most recent value
-        if len(stock_df) > 0:
-            most_recent_close = float(stock_df.iloc[0][close_col])
+        if len(recent_closes) > 0:
+            most_recent_close = recent_closes[0]
             if lags['Close_lag1'] == 0.0:
                 lags['Close_lag1'] = most_recent_close
             if lags['Close_lag2'] == 0.0:
@@ -191,6 +318,47 @@ def get_lag_features(symbol, date_str=None, current_close=None):
         logger.warning(f"Error fetching lag features: {str(e)}, using defaults")
         return get_default_lags(current_close)
 
+@functools.lru_cache(maxsize=4096)
+def _get_recent_closes(symbol, date_str, dataset_key):
+    """
+    Return up to 3 closes of a stock before date_str, most recent first
+    
+    Returns None when the dataset has no usable history for the symbol.
+    Results are cached per dataset_key, so a reloaded dataset is never
+    served stale values.
+    """
+    cache = _get_dataset_cache()
+    schema = cache['schema']
+    
+    if not schema.symbol_col:
+        logger.warning("No symbol column found, using default lag values")
+        return None
+    
+    if not schema.date_col:
+        logger.warning("No date column found, using default lag values")
+        return None
+    
+    if not schema.close_col:
+        logger.warning("No close column found, using default lag values")
+        return None
+    
+    # The symbol's dates and closes (case-insensitive), sorted by date at load
+    history = cache['symbol_closes'].get(symbol)
+    
+    if history is None or len(history[0]) == 0:
+        logger.warning(f"No historical data found for {symbol}, using default lag values")
+        return None
+    
+    # Get the most recent close prices (excluding current date if provided)
+    before = np.iinfo(np.int64).max
+    if date_str:
+        date_obj = pd.to_datetime(date_str, errors='coerce')
+        if not pd.isna(date_obj):
+            before = date_obj.to_datetime64().astype('datetime64[ns]').astype(np.int64)
+    
+    dates, closes = history
+    return tuple(_recent_closes_before(dates, closes, np.int64(before)).tolist())
+
 def get_default_lags(current_close=None):
     """
     Get default lag values when historical data is not available
@@ -230,43 +398,402 @@ def validate_numeric_input(value, field_name, min_value=None, max_value=None):
     except (ValueError, TypeError) as e:
         raise ValueError(f"Invalid {field_name}: {str(e)}")
 
+def get_default_dataset_path():
+    """
+    Return the path of the dataset in the backend directory
+    
+    Prefers dataset.parquet (see convert_dataset_to_parquet) when a Parquet
+    engine is installed and the copy is not older than dataset.csv.
+    """
+    # Get backend directory (parent of utils directory)
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    csv_path = os.path.join(backend_dir, 'dataset.csv')
+    parquet_path = os.path.join(backend_dir, 'dataset.parquet')
+    
+    has_parquet_engine = any(
+        importlib.util.find_spec(engine) is not None for engine in ('pyarrow', 'fastparquet')
+    )
+    if has_parquet_engine and os.path.exists(parquet_path):
+        if not os.path.exists(csv_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path):
+            return parquet_path
+    
+    return csv_path
+
+def convert_dataset_to_parquet(csv_path=None, parquet_path=None):
+    """
+    Write a Parquet copy of the CSV dataset for faster loading
+    
+    Date is stored as datetime64 and the symbol column as category, so
+    reading the copy skips text parsing and type conversion.
+    Returns the path of the written file.
+    """
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if csv_path is None:
+        csv_path = os.path.join(backend_dir, 'dataset.csv')
+    if parquet_path is None:
+        parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+    
+    df = _read_csv(csv_path)
+    df = _prepare_dataset(df, DatasetSchema.detect(df))
+    
+    df.to_parquet(parquet_path, index=False)
+    logger.info(f"Dataset written to {parquet_path}: {len(df)} rows")
+    
+    return parquet_path
+
 def load_dataset(file_path=None):
-    """Load and return the dataset"""
+    """
+    Load and return the dataset
+    
+    The parsed DataFrame is cached and only re-read when the file's
+    modification time changes. The returned frame is shared between
+    requests, so callers must not modify it in place.
+    """
+    return _get_dataset_cache(file_path)['df']
+
+def get_dataset_schema(file_path=None):
+    """Return the DatasetSchema detected when the dataset was loaded"""
+    return _get_dataset_cache(file_path)['schema']
+
+def get_dataset_key(file_path=None):
+    """Return the (path, mtime) key of the cached dataset, for caching derived results"""
+    return _get_dataset_cache(file_path)['key']
+
+def get_symbol_positions(symbol, file_path=None):
+    """Return the row positions of a stock symbol (case-insensitive) in the dataset"""
+    positions = _get_dataset_cache(file_path)['symbol_index'].get(str(symbol).upper())
+    if positions is None:
+        return np.empty(0, dtype=np.intp)
+    return positions
+
+def get_symbol_rows(symbol, with_lags=False, file_path=None):
+    """
+    Return the rows for a stock symbol (case-insensitive) from the cached dataset
+    
+    With with_lags=True the LAG_COLUMNS are added, holding the stock's
+    previous closes by date (its earliest close where there is no history).
+    """
+    cache = _get_dataset_cache(file_path)
+    positions = get_symbol_positions(symbol, file_path)
+    
+    rows = cache['df'].iloc[positions]
+    if with_lags and cache['close_lags'] is not None:
+        lags = cache['close_lags'][positions]
+        rows = rows.assign(**{col: lags[:, i] for i, col in enumerate(LAG_COLUMNS)})
+    return rows
+
+def find_symbol_row(symbol, date, file_path=None):
+    """
+    Return a stock's row for a date, or else its closest earlier row
+    
+    An exact day is a dict lookup; otherwise the latest earlier row is
+    found by binary search. Returns None if the symbol (case-insensitive)
+    has no row on or before the date.
+    """
+    cache = _get_dataset_cache(file_path)
+    days, day_positions = cache['symbol_days'].get(str(symbol).upper(), (None, {}))
+    day = int(np.datetime64(pd.Timestamp(date).date(), 'D').astype(np.int64))
+    
+    position = day_positions.get(day)
+    if position is None and days is not None:
+        earlier = days.searchsorted(day, side='right')
+        if earlier > 0:
+            position = cache['symbol_history'][str(symbol).upper()][earlier - 1]
+    
+    return None if position is None else cache['df'].iloc[position]
+
+def get_dataset_stocks(file_path=None):
+    """Return the sorted stock symbols in the dataset"""
+    return _get_dataset_cache(file_path)['stocks']
+
+def get_date_range_rows(start_date=None, end_date=None, file_path=None):
+    """
+    Return the rows dated between start_date and end_date (inclusive)
+    
+    The bounds are found by binary search over the cached date order
+    instead of comparing every row; rows keep their dataset order.
+    """
+    cache = _get_dataset_cache(file_path)
+    df = cache['df']
+    if cache['date_order'] is None:
+        return df
+    
+    order, sorted_dates = cache['date_order']
+    lo, hi = 0, len(sorted_dates)
+    if start_date:
+        lo = sorted_dates.searchsorted(pd.Timestamp(start_date).to_datetime64(), side='left')
+    if end_date:
+        hi = sorted_dates.searchsorted(pd.Timestamp(end_date).to_datetime64(), side='right')
+    
+    return df.iloc[np.sort(order[lo:hi])]
+
+def get_search_text(file_path=None):
+    """
+    Return each row's values as one lower-cased, space-separated string
+    
+    Used for full-text search of the dataset. Built on first use and kept
+    with the cached dataset; dates are written in the CSV's own format.
+    """
+    cache = _get_dataset_cache(file_path)
+    if cache['search_text'] is None:
+        cache['search_text'] = _build_search_text(cache['df'])
+    return cache['search_text']
+
+def _get_dataset_cache(file_path=None):
+    """Return the cache entry for the dataset, (re)loading it if the file changed"""
+    global _dataset_cache
     try:
-        # Default to dataset.csv in backend directory
+        # Default to dataset.csv (or its Parquet copy) in backend directory
         if file_path is None:
-            import os
-            # Get backend directory (parent of utils directory)
-            backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            file_path = os.path.join(backend_dir, 'dataset.csv')
+            file_path = get_default_dataset_path()
         
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Dataset not found: {file_path}")
         
-        df = pd.read_csv(file_path)
+        cache_key = (file_path, os.path.getmtime(file_path))
+        cache = _dataset_cache
+        if cache['key'] == cache_key:
+            return cache
+        
+        if file_path.endswith('.parquet'):
+            df = pd.read_parquet(file_path)
+        else:
+            df = _read_csv(file_path)
+        
+        schema = DatasetSchema.detect(df)
+        df = _prepare_dataset(df, schema)
+        symbol_index = _build_symbol_index(df, schema)
+        symbol_history = _build_symbol_history(df, schema, symbol_index)
+        cache = {
+            'key': cache_key,
+            'df': df,
+            'schema': schema,
+            'symbol_index': symbol_index,
+            'symbol_history': symbol_history,
+            'symbol_days': _build_symbol_days(df, schema, symbol_history),
+            'symbol_closes': _build_symbol_closes(df, schema, symbol_history),
+            'close_lags': _build_close_lags(df, schema),
+            'date_order': _build_date_order(df, schema),
+            'search_text': None,
+            'stocks': _build_stock_list(df, schema)
+        }
+        _dataset_cache = cache
         logger.info(f"Dataset loaded: {len(df)} rows, {len(df.columns)} columns")
         
-        return df
+        return cache
     
     except Exception as e:
         logger.error(f"Error loading dataset: {str(e)}")
         raise
 
+def _read_csv(file_path):
+    """
+    Read a dataset CSV into a DataFrame
+    
+    Uses pyarrow's multi-threaded reader when it is installed, which also
+    parses DATASET_DATE_FORMAT dates while reading. Unnamed and all-empty
+    columns are named and typed the way pandas.read_csv does it.
+    """
+    if pa_csv is None:
+        return pd.read_csv(file_path)
+    
+    convert_options = pa_csv.ConvertOptions(timestamp_parsers=[DATASET_DATE_FORMAT, pa_csv.ISO8601])
+    table = pa_csv.read_csv(file_path, convert_options=convert_options)
+    df = table.to_pandas()
+    for i, field in enumerate(table.schema):
+        if pa.types.is_null(field.type):
+            df.isetitem(i, df.iloc[:, i].astype(float))
+    df.columns = [name if name else f'Unnamed: {i}' for i, name in enumerate(df.columns)]
+    return df
+
+def parse_dataset_dates(values):
+    """
+    Parse a column of dataset dates to datetime, NaT where invalid
+    
+    Uses DATASET_DATE_FORMAT directly; values in any other format fall
+    back to pandas' inferred parsing.
+    """
+    dates = pd.to_datetime(values, format=DATASET_DATE_FORMAT, errors='coerce')
+    unparsed = dates.isna() & values.notna()
+    if unparsed.any():
+        dates[unparsed] = pd.to_datetime(values[unparsed], errors='coerce', format='mixed')
+    return dates
+
+def _prepare_dataset(df, schema):
+    """
+    Normalise column types once so requests can use them directly
+    
+    Dates are parsed to datetime and the symbol column is stored as a
+    category of strings.
+    """
+    date_col = schema.date_col
+    if date_col and not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+        df[date_col] = parse_dataset_dates(df[date_col])
+    
+    symbol_column = schema.symbol_col
+    if symbol_column and not isinstance(df[symbol_column].dtype, pd.CategoricalDtype):
+        df[symbol_column] = df[symbol_column].astype(str).astype('category')
+    return df
+
+def _build_stock_list(df, schema):
+    """Return the sorted unique stock symbols, or [] without a symbol column"""
+    if schema.symbol_col is None:
+        return []
+    return sorted(df[schema.symbol_col].unique().tolist())
+
+def _build_symbol_index(df, schema):
+    """Map each upper-cased stock symbol to the positions of its rows"""
+    if schema.symbol_col is None:
+        return {}
+    return df.groupby(df[schema.symbol_col].str.upper(), observed=True).indices
+
+def _build_symbol_history(df, schema, symbol_index):
+    """Map each upper-cased symbol to the positions of its dated rows, sorted by date"""
+    if schema.date_col is None:
+        return {}
+    
+    dates = df[schema.date_col].to_numpy()
+    history = {}
+    for symbol, positions in symbol_index.items():
+        positions = positions[np.argsort(dates[positions], kind='stable')]
+        history[symbol] = positions[~np.isnat(dates[positions])]
+    return history
+
+def _build_symbol_days(df, schema, symbol_history):
+    """
+    Map each symbol to (its sorted row days, {day: position})
+    
+    Days are counted from the epoch, one entry per symbol_history row; the
+    first row in the file wins where a day repeats.
+    """
+    if schema.date_col is None:
+        return {}
+    
+    dates = df[schema.date_col].to_numpy()
+    symbol_days = {}
+    for symbol, positions in symbol_history.items():
+        days = dates[positions].astype('datetime64[D]').astype(np.int64)
+        symbol_days[symbol] = (days, dict(zip(days[::-1].tolist(), positions[::-1].tolist())))
+    return symbol_days
+
+def _build_symbol_closes(df, schema, symbol_history):
+    """Map each symbol to (date as int64 ns, close) arrays of its rows in date order"""
+    if schema.date_col is None or schema.close_col is None:
+        return {}
+    
+    dates = df[schema.date_col].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    closes = df[schema.close_col].to_numpy(dtype=float)
+    return {
+        symbol: (dates[positions], closes[positions])
+        for symbol, positions in symbol_history.items()
+    }
+
+def _recent_closes_before(dates, closes, before):
+    """Return up to 3 non-NaN closes dated before `before`, most recent first"""
+    i = np.searchsorted(dates, before) - 1
+    recent = np.empty(3)
+    count = 0
+    while i >= 0 and count < 3:
+        if not np.isnan(closes[i]):
+            recent[count] = closes[i]
+            count += 1
+        i -= 1
+    return recent[:count]
+
+if numba is not None:
+    _recent_closes_before = numba.njit(cache=True)(_recent_closes_before)
+
+def _build_date_order(df, schema):
+    """
+    Return (positions sorted by date, dates in that order), or None without a date column
+    
+    Rows without a date never match a date range, so they are left out
+    (NaT sorts last, so they are the tail of the order).
+    """
+    if schema.date_col is None:
+        return None
+    dates = df[schema.date_col].to_numpy()
+    order = np.argsort(dates, kind='stable')
+    n_dated = len(order) - int(np.isnat(dates).sum())
+    order = order[:n_dated]
+    return order, dates[order]
+
+def _build_search_text(df):
+    """Concatenate every column as lower-cased text, one string per row"""
+    parts = []
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            text = df[col].dt.strftime(DATASET_DATE_FORMAT)
+        else:
+            text = df[col].astype(str)
+        parts.append(text.str.lower())
+    return parts[0].str.cat(parts[1:], sep=' ', na_rep='nan')
+
+def _build_close_lags(df, schema):
+    """
+    Compute LAG_COLUMNS for every row, aligned with the dataset's positions
+    
+    Lags are the stock's previous closes in date order; rows without enough
+    history use the stock's earliest close. Returns None if the dataset
+    lacks a symbol, date or close column.
+    """
+    symbol_column, date_col, close_col = schema.symbol_col, schema.date_col, schema.close_col
+    if symbol_column is None or date_col is None or close_col is None:
+        return None
+    
+    # Index labels are row positions, so the result can be scattered back
+    history = pd.DataFrame({
+        'symbol': df[symbol_column].str.upper().to_numpy(dtype=str),
+        'date': df[date_col].to_numpy(),
+        'close': df[close_col].to_numpy(dtype=float)
+    }).sort_values(by=['symbol', 'date'], kind='stable')
+    
+    closes = history.groupby('symbol', sort=False)['close']
+    first_close = closes.transform('first')
+    
+    lags = np.empty((len(df), len(LAG_COLUMNS)))
+    for i in range(len(LAG_COLUMNS)):
+        lags[history.index.to_numpy(), i] = closes.shift(i + 1).fillna(first_close).to_numpy()
+    return lags
+
+def dataframe_to_records(df):
+    """
+    Convert a DataFrame to a list of JSON-ready dicts
+    
+    Values become plain Python objects and missing values become None,
+    without walking the records cell by cell. Date columns are written in
+    the dataset's own format ("Oct 09, 2025"), as they appear in dataset.csv.
+    """
+    date_cols = df.select_dtypes(include=['datetime', 'datetimetz']).columns
+    if len(date_cols):
+        df = df.assign(**{col: df[col].dt.strftime(DATASET_DATE_FORMAT) for col in date_cols})
+    
+    object_df = df.astype(object)
+    return object_df.where(object_df.notna(), None).to_dict('records')
+
 def get_dataset_summary(df):
     """Generate summary statistics for the dataset"""
     try:
+        # Numeric column statistics, computed once and reused for missing counts
+        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+        numeric_summary = df[numeric_cols].describe() if numeric_cols else None
+        
+        non_null = {}
+        if numeric_summary is not None:
+            non_null = numeric_summary.loc['count'].to_dict()
+        other_cols = [col for col in df.columns if col not in non_null]
+        non_null.update(df[other_cols].count().to_dict())
+        
         summary = {
             "total_rows": len(df),
             "total_columns": len(df.columns),
             "columns": df.columns.tolist(),
-            "missing_values": df.isnull().sum().to_dict(),
+            "missing_values": {col: len(df) - int(non_null[col]) for col in df.columns},
             "data_types": df.dtypes.astype(str).to_dict()
         }
         
-        # Numeric column statistics
-        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-        if numeric_cols:
-            summary["numeric_summary"] = df[numeric_cols].describe().to_dict()
+        if numeric_summary is not None:
+            summary["numeric_summary"] = numeric_summary.to_dict()
         
         return summary
     
@@ -0,0 +1,16 @@
+"""
+WSGI entry point for running the API under Gunicorn
+
+    gunicorn -w 4 --preload --worker-class gthread --threads 8 -b 0.0.0.0:5001 wsgi:app
+
+With --preload the app (model, label encoder and dataset) is loaded once in
+the master process and shared copy-on-write with the forked workers.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+
+app = create_app()